@@ -1,26 +1,53 @@
-from fastapi import FastAPI, APIRouter, HTTPException
+from fastapi import FastAPI, APIRouter, HTTPException, Response
+from fastapi.responses import ORJSONResponse, StreamingResponse
 from dotenv import load_dotenv
+from starlette.datastructures import Headers, MutableHeaders
 from starlette.middleware.cors import CORSMiddleware
 from motor.motor_asyncio import AsyncIOMotorClient
+from redis import asyncio as aioredis
+from redis.exceptions import RedisError
+from pymongo import ReturnDocument
+from pymongo.errors import DuplicateKeyError
+from bson import ObjectId
 import os
+import time
+import hashlib
+import asyncio
 import logging
 from pathlib import Path
+import anyio
+import orjson
 from pydantic import BaseModel, Field
 from typing import List, Optional
-import uuid
-from datetime import datetime, timezone
+from datetime import datetime, timedelta, timezone
 from enum import Enum
+from types import MappingProxyType
 
 ROOT_DIR = Path(__file__).parent
 load_dotenv(ROOT_DIR / '.env')
 
 # MongoDB connection
 mongo_url = os.environ['MONGO_URL']
-client = AsyncIOMotorClient(mongo_url)
+client = AsyncIOMotorClient(
+    mongo_url,
+    tz_aware=True,
+    maxPoolSize=200,
+    minPoolSize=20,
+    compressors='zstd,zlib',
+    retryWrites=True,
+    serverSelectionTimeoutMS=2000,
+)
 db = client[os.environ['DB_NAME']]
 
+# Redis connection (response cache)
+redis_client = aioredis.from_url(
+    os.environ.get('REDIS_URL', 'redis://localhost:6379/0'),
+    socket_connect_timeout=0.3,
+    socket_timeout=0.3,
+)
+
 # Create the main app without a prefix
-app = FastAPI()
+app = FastAPI(default_response_class=ORJSONResponse)
 
 # Create a router with the /api prefix
 api_router = APIRouter(prefix="/api")
@@ -40,9 +67,44 @@ class PetStage(str, Enum):
     ADULT = "adult"
     LEGENDARY = "legendary"
 
+POSITIVE_EMOTIONS = frozenset({Emotion.HAPPY, Emotion.EXCITED, Emotion.CALM})
+NEGATIVE_EMOTIONS = frozenset({Emotion.SAD, Emotion.ANGRY, Emotion.ANXIOUS})
+
+# (current stage, experience threshold, evolved stage)
+EVOLUTION_THRESHOLDS = (
+    (PetStage.ADULT, 300, PetStage.LEGENDARY),
+    (PetStage.BABY, 150, PetStage.ADULT),
+    (PetStage.EGG, 50, PetStage.BABY),
+)
+
+_current_stage = {"$ifNull": ["$stage", PetStage.EGG.value]}
+EVOLUTION_STAGE = {"$switch": {
+    "branches": [
+        {"case": {"$and": [{"$gte": ["$experience", threshold]}, {"$eq": [_current_stage, stage.value]}]}, "then": evolved.value}
+        for stage, threshold, evolved in EVOLUTION_THRESHOLDS
+    ],
+    "default": _current_stage
+}}
+
+DEFAULT_SHOP_ITEMS = (
+    MappingProxyType({"name": "Premium Food", "description": "Increases happiness by 25", "price": 50, "category": "food", "icon": "🍖"}),
+    MappingProxyType({"name": "Toy Ball", "description": "Fun toy for playing", "price": 30, "category": "toy", "icon": "🏀"}),
+    MappingProxyType({"name": "Training Weights", "description": "Boosts training effectiveness", "price": 75, "category": "training", "icon": "🏋️"}),
+    MappingProxyType({"name": "Sparkle Background", "description": "Beautiful starry background", "price": 100, "category": "background", "icon": "✨"}),
+    MappingProxyType({"name": "Rainbow Collar", "description": "Colorful pet accessory", "price": 60, "category": "accessory", "icon": "🌈"}),
+)
+
+DEFAULT_ACHIEVEMENTS = (
+    MappingProxyType({"name": "First Steps", "description": "Create your first pet", "icon": "🐣"}),
+    MappingProxyType({"name": "Mood Tracker", "description": "Log 10 mood entries", "icon": "📊"}),
+    MappingProxyType({"name": "Happy Pet", "description": "Reach 100 happiness", "icon": "😊"}),
+    MappingProxyType({"name": "Evolution Master", "description": "Evolve to Adult stage", "icon": "🌟"}),
+    MappingProxyType({"name": "Coin Collector", "description": "Earn 500 coins", "icon": "💰"}),
+)
+
 # Models
 class Pet(BaseModel):
-    id: str = Field(default_factory=lambda: str(uuid.uuid4()))
+    id: str = Field(default_factory=lambda: str(ObjectId()))
     name: str = "MoodPet"
     stage: PetStage = PetStage.EGG
     happiness: int = 50
@@ -64,7 +126,7 @@ class PetUpdate(BaseModel):
     coins: Optional[int] = None
 
 class MoodEntry(BaseModel):
-    id: str = Field(default_factory=lambda: str(uuid.uuid4()))
+    id: str = Field(default_factory=lambda: str(ObjectId()))
     emotion: Emotion
     intensity: int = Field(default=5, ge=1, le=10)
     note: Optional[str] = None
@@ -78,7 +140,7 @@ class MoodEntryCreate(BaseModel):
     pet_id: str
 
 class Achievement(BaseModel):
-    id: str = Field(default_factory=lambda: str(uuid.uuid4()))
+    id: str = Field(default_factory=lambda: str(ObjectId()))
     name: str
     description: str
     icon: str
@@ -87,212 +149,293 @@ class Achievement(BaseModel):
     pet_id: str
 
 class ShopItem(BaseModel):
-    id: str = Field(default_factory=lambda: str(uuid.uuid4()))
+    id: str = Field(default_factory=lambda: str(ObjectId()))
     name: str
     description: str
     price: int
     category: str
     icon: str
 
+# Projections matching the response models, so Mongo never sends _id or stray fields
+PET_PROJECTION = {"_id": 0, **dict.fromkeys(Pet.model_fields, 1)}
+MOOD_ENTRY_PROJECTION = {"_id": 0, **dict.fromkeys(MoodEntry.model_fields, 1)}
+ACHIEVEMENT_PROJECTION = {"_id": 0, **dict.fromkeys(Achievement.model_fields, 1)}
+SHOP_ITEM_PROJECTION = {"_id": 0, **dict.fromkeys(ShopItem.model_fields, 1)}
+
 # Helper functions
-def prepare_for_mongo(data):
-    if isinstance(data, dict):
-        for key, value in data.items():
-            if isinstance(value, datetime):
-                data[key] = value.isoformat()
-    return data
-
-def parse_from_mongo(item):
-    if isinstance(item, dict):
-        for key, value in item.items():
-            if isinstance(value, str) and key in ['created_at', 'timestamp', 'last_fed', 'last_played', 'last_trained', 'unlocked_at']:
-                try:
-                    item[key] = datetime.fromisoformat(value.replace('Z', '+00:00'))
-                except:
-                    pass
+def clean_from_mongo(item):
+    item.pop("_id", None)
     return item
 
+STREAM_BATCH_SIZE = 500
+OFFLOAD_ENCODE_THRESHOLD = 200
+
+async def stream_json_array(cursor):
+    yield b"["
+    separator = b""
+    while batch := await cursor.to_list(length=STREAM_BATCH_SIZE):
+        # Encode large batches in a worker thread to keep the event loop responsive
+        if len(batch) > OFFLOAD_ENCODE_THRESHOLD:
+            encoded = await anyio.to_thread.run_sync(orjson.dumps, batch)
+        else:
+            encoded = orjson.dumps(batch)
+        yield separator + encoded[1:-1]
+        separator = b","
+    yield b"]"
+
+# Stale-while-revalidate cache
+_refreshing = {}
+_inflight = {}
+
+async def _store_swr(key, value, ttl, stale_ttl):
+    async with redis_client.pipeline(transaction=True) as pipe:
+        pipe.set(key, value, ex=stale_ttl)
+        pipe.set(f"{key}:fresh_until", time.time() + ttl, ex=stale_ttl)
+        await pipe.execute()
+
+async def _background_refresh(key, factory, ttl, stale_ttl):
+    try:
+        await _store_swr(key, await factory(), ttl, stale_ttl)
+    except Exception:
+        logger.exception("Background refresh failed for %s", key)
+    finally:
+        _refreshing.pop(key, None)
+
+async def _fill_swr(key, factory, ttl, stale_ttl):
+    try:
+        value = await factory()
+        try:
+            await _store_swr(key, value, ttl, stale_ttl)
+        except RedisError:
+            logger.warning("Redis unavailable, could not cache %s", key)
+        return value
+    finally:
+        _inflight.pop(key, None)
+
+async def get_or_set_swr(key, factory, ttl=300, stale_ttl=600):
+    try:
+        cached, fresh_until = await redis_client.mget(key, f"{key}:fresh_until")
+    except RedisError:
+        logger.warning("Redis unavailable, bypassing cache for %s", key)
+        return await factory()
+
+    if cached is not None:
+        if (fresh_until is None or time.time() > float(fresh_until)) and key not in _refreshing:
+            _refreshing[key] = asyncio.create_task(_background_refresh(key, factory, ttl, stale_ttl))
+        return cached
+
+    # Coalesce concurrent misses so only one caller hits the database
+    if key not in _inflight:
+        _inflight[key] = asyncio.create_task(_fill_swr(key, factory, ttl, stale_ttl))
+    return await asyncio.shield(_inflight[key])
+
 # Pet Routes
 @api_router.post("/pets", response_model=Pet)
 async def create_pet(pet_data: PetCreate):
-    pet_dict = Pet(name=pet_data.name).dict()
-    pet_dict = prepare_for_mongo(pet_dict)
-    await db.pets.insert_one(pet_dict)
-    return Pet(**parse_from_mongo(pet_dict))
+    pet = Pet(name=pet_data.name)
+    await db.pets.insert_one(pet.model_dump())
+    return pet
 
 @api_router.get("/pets/{pet_id}", response_model=Pet)
 async def get_pet(pet_id: str):
-    pet = await db.pets.find_one({"id": pet_id})
+    pet = await db.pets.find_one({"id": pet_id}, PET_PROJECTION)
     if not pet:
         raise HTTPException(status_code=404, detail="Pet not found")
-    return Pet(**parse_from_mongo(pet))
+    return Pet(**pet)
 
 @api_router.get("/pets", response_model=List[Pet])
 async def get_all_pets():
-    pets = await db.pets.find().to_list(1000)
-    return [Pet(**parse_from_mongo(pet)) for pet in pets]
+    cursor = db.pets.find({}, PET_PROJECTION).limit(1000)
+    return StreamingResponse(stream_json_array(cursor), media_type="application/json")
 
 @api_router.put("/pets/{pet_id}", response_model=Pet)
 async def update_pet(pet_id: str, pet_update: PetUpdate):
-    update_data = {k: v for k, v in pet_update.dict().items() if v is not None}
+    update_data = pet_update.model_dump(exclude_unset=True, exclude_none=True)
     if update_data:
-        await db.pets.update_one({"id": pet_id}, {"$set": update_data})
-    
-    pet = await db.pets.find_one({"id": pet_id})
+        pet = await db.pets.find_one_and_update(
+            {"id": pet_id}, {"$set": update_data}, projection=PET_PROJECTION, return_document=ReturnDocument.AFTER
+        )
+    else:
+        pet = await db.pets.find_one({"id": pet_id}, PET_PROJECTION)
     if not pet:
         raise HTTPException(status_code=404, detail="Pet not found")
-    return Pet(**parse_from_mongo(pet))
+    return Pet(**pet)
 
 # Pet Actions
-@api_router.post("/pets/{pet_id}/feed")
-async def feed_pet(pet_id: str):
-    pet = await db.pets.find_one({"id": pet_id})
+def clamped_add(field, amount, default):
+    return {"$min": [100, {"$add": [{"$ifNull": [f"${field}", default]}, amount]}]}
+
+def counter_add(field, amount, default):
+    return {"$add": [{"$ifNull": [f"${field}", default]}, amount]}
+
+async def apply_pet_action(pet_id: str, pipeline: list):
+    pet = await db.pets.find_one_and_update(
+        {"id": pet_id}, pipeline, projection=PET_PROJECTION, return_document=ReturnDocument.AFTER
+    )
     if not pet:
         raise HTTPException(status_code=404, detail="Pet not found")
-    
+    return Pet(**pet)
+
+@api_router.post("/pets/{pet_id}/feed")
+async def feed_pet(pet_id: str):
     now = datetime.now(timezone.utc)
-    updates = {
-        "happiness": min(100, pet.get("happiness", 50) + 15),
-        "health": min(100, pet.get("health", 100) + 10),
-        "coins": pet.get("coins", 100) + 5,
-        "experience": pet.get("experience", 0) + 10,
-        "last_fed": now.isoformat()
-    }
-    
-    await db.pets.update_one({"id": pet_id}, {"$set": updates})
-    
-    updated_pet = await db.pets.find_one({"id": pet_id})
-    return {"message": "Pet fed successfully!", "pet": Pet(**parse_from_mongo(updated_pet))}
+    pet = await apply_pet_action(pet_id, [
+        {"$set": {
+            "happiness": clamped_add("happiness", 15, 50),
+            "health": clamped_add("health", 10, 100),
+            "coins": counter_add("coins", 5, 100),
+            "experience": counter_add("experience", 10, 0),
+            "last_fed": now
+        }}
+    ])
+    return {"message": "Pet fed successfully!", "pet": pet}
 
 @api_router.post("/pets/{pet_id}/play")
 async def play_with_pet(pet_id: str):
-    pet = await db.pets.find_one({"id": pet_id})
-    if not pet:
-        raise HTTPException(status_code=404, detail="Pet not found")
-    
     now = datetime.now(timezone.utc)
-    updates = {
-        "happiness": min(100, pet.get("happiness", 50) + 20),
-        "coins": pet.get("coins", 100) + 8,
-        "experience": pet.get("experience", 0) + 15,
-        "last_played": now.isoformat()
-    }
-    
-    await db.pets.update_one({"id": pet_id}, {"$set": updates})
-    
-    updated_pet = await db.pets.find_one({"id": pet_id})
-    return {"message": "Had fun playing!", "pet": Pet(**parse_from_mongo(updated_pet))}
+    pet = await apply_pet_action(pet_id, [
+        {"$set": {
+            "happiness": clamped_add("happiness", 20, 50),
+            "coins": counter_add("coins", 8, 100),
+            "experience": counter_add("experience", 15, 0),
+            "last_played": now
+        }}
+    ])
+    return {"message": "Had fun playing!", "pet": pet}
 
 @api_router.post("/pets/{pet_id}/train")
 async def train_pet(pet_id: str):
-    pet = await db.pets.find_one({"id": pet_id})
-    if not pet:
-        raise HTTPException(status_code=404, detail="Pet not found")
-    
     now = datetime.now(timezone.utc)
-    updates = {
-        "happiness": min(100, pet.get("happiness", 50) + 10),
-        "health": min(100, pet.get("health", 100) + 5),
-        "coins": pet.get("coins", 100) + 12,
-        "experience": pet.get("experience", 0) + 25,
-        "last_trained": now.isoformat()
-    }
-    
-    # Check for evolution
-    experience = updates["experience"]
-    current_stage = pet.get("stage", "egg")
-    
-    if experience >= 300 and current_stage == "adult":
-        updates["stage"] = "legendary"
-    elif experience >= 150 and current_stage == "baby":
-        updates["stage"] = "adult"
-    elif experience >= 50 and current_stage == "egg":
-        updates["stage"] = "baby"
-    
-    await db.pets.update_one({"id": pet_id}, {"$set": updates})
-    
-    updated_pet = await db.pets.find_one({"id": pet_id})
-    return {"message": "Training completed!", "pet": Pet(**parse_from_mongo(updated_pet))}
+    pet = await apply_pet_action(pet_id, [
+        {"$set": {
+            "happiness": clamped_add("happiness", 10, 50),
+            "health": clamped_add("health", 5, 100),
+            "coins": counter_add("coins", 12, 100),
+            "experience": counter_add("experience", 25, 0),
+            "last_trained": now
+        }},
+        # Check for evolution against the updated experience
+        {"$set": {"stage": EVOLUTION_STAGE}}
+    ])
+    return {"message": "Training completed!", "pet": pet}
 
 # Mood Routes
 @api_router.post("/moods", response_model=MoodEntry)
 async def create_mood_entry(mood_data: MoodEntryCreate):
-    mood_dict = MoodEntry(**mood_data.dict()).dict()
-    mood_dict = prepare_for_mongo(mood_dict)
-    await db.mood_entries.insert_one(mood_dict)
-    
+    mood = MoodEntry(**mood_data.model_dump())
+
     # Update pet happiness based on mood
-    pet = await db.pets.find_one({"id": mood_data.pet_id})
-    if pet:
-        happiness_change = 0
-        if mood_data.emotion in [Emotion.HAPPY, Emotion.EXCITED, Emotion.CALM]:
-            happiness_change = mood_data.intensity
-        elif mood_data.emotion in [Emotion.SAD, Emotion.ANGRY, Emotion.ANXIOUS]:
-            happiness_change = -mood_data.intensity // 2
-        
-        new_happiness = max(0, min(100, pet.get("happiness", 50) + happiness_change))
-        coins_earned = 10 + mood_data.intensity
-        
-        await db.pets.update_one(
-            {"id": mood_data.pet_id}, 
-            {"$set": {"happiness": new_happiness}, "$inc": {"coins": coins_earned, "experience": 5}}
-        )
-    
-    return MoodEntry(**parse_from_mongo(mood_dict))
+    happiness_change = 0
+    if mood_data.emotion in POSITIVE_EMOTIONS:
+        happiness_change = mood_data.intensity
+    elif mood_data.emotion in NEGATIVE_EMOTIONS:
+        happiness_change = -mood_data.intensity // 2
+    coins_earned = 10 + mood_data.intensity
+
+    await asyncio.gather(
+        db.mood_entries.insert_one(mood.model_dump()),
+        db.pets.update_one({"id": mood_data.pet_id}, [
+            {"$set": {
+                "happiness": {"$max": [0, {"$min": [100, {"$add": [{"$ifNull": ["$happiness", 50]}, happiness_change]}]}]},
+                "coins": counter_add("coins", coins_earned, 0),
+                "experience": counter_add("experience", 5, 0)
+            }}
+        ])
+    )
+
+    return mood
 
 @api_router.get("/moods/{pet_id}", response_model=List[MoodEntry])
 async def get_mood_entries(pet_id: str):
-    moods = await db.mood_entries.find({"pet_id": pet_id}).sort("timestamp", -1).to_list(100)
-    return [MoodEntry(**parse_from_mongo(mood)) for mood in moods]
+    cursor = db.mood_entries.find({"pet_id": pet_id}, MOOD_ENTRY_PROJECTION).sort("timestamp", -1).limit(100)
+    return StreamingResponse(stream_json_array(cursor), media_type="application/json")
 
 # Shop Routes
+async def load_shop_items() -> bytes:
+    items = await db.shop_items.find({}, SHOP_ITEM_PROJECTION).to_list(100)
+    return orjson.dumps(items)
+
 @api_router.get("/shop", response_model=List[ShopItem])
 async def get_shop_items():
-    # Default shop items
-    default_items = [
-        {"name": "Premium Food", "description": "Increases happiness by 25", "price": 50, "category": "food", "icon": "🍖"},
-        {"name": "Toy Ball", "description": "Fun toy for playing", "price": 30, "category": "toy", "icon": "🏀"},
-        {"name": "Training Weights", "description": "Boosts training effectiveness", "price": 75, "category": "training", "icon": "🏋️"},
-        {"name": "Sparkle Background", "description": "Beautiful starry background", "price": 100, "category": "background", "icon": "✨"},
-        {"name": "Rainbow Collar", "description": "Colorful pet accessory", "price": 60, "category": "accessory", "icon": "🌈"},
-    ]
-    
-    existing_items = await db.shop_items.find().to_list(100)
-    if not existing_items:
-        for item_data in default_items:
-            item = ShopItem(id=str(uuid.uuid4()), **item_data)
-            await db.shop_items.insert_one(item.dict())
-        
-        existing_items = await db.shop_items.find().to_list(100)
-    
-    return [ShopItem(**item) for item in existing_items]
+    content = await get_or_set_swr("shop_items", load_shop_items)
+    return Response(content=content, media_type="application/json")
 
 # Achievements
-@api_router.get("/achievements/{pet_id}", response_model=List[Achievement])
-async def get_achievements(pet_id: str):
-    achievements = await db.achievements.find({"pet_id": pet_id}).to_list(100)
-    
+async def load_achievements(pet_id: str) -> bytes:
+    achievements = await db.achievements.find({"pet_id": pet_id}, ACHIEVEMENT_PROJECTION).to_list(100)
+
     # Create default achievements if none exist
     if not achievements:
-        default_achievements = [
-            {"name": "First Steps", "description": "Create your first pet", "icon": "🐣"},
-            {"name": "Mood Tracker", "description": "Log 10 mood entries", "icon": "📊"},
-            {"name": "Happy Pet", "description": "Reach 100 happiness", "icon": "😊"},
-            {"name": "Evolution Master", "description": "Evolve to Adult stage", "icon": "🌟"},
-            {"name": "Coin Collector", "description": "Earn 500 coins", "icon": "💰"},
-        ]
-        
-        for ach_data in default_achievements:
-            achievement = Achievement(pet_id=pet_id, **ach_data)
-            await db.achievements.insert_one(achievement.dict())
-        
-        achievements = await db.achievements.find({"pet_id": pet_id}).to_list(100)
-    
-    return [Achievement(**parse_from_mongo(ach)) for ach in achievements]
+        achievements = [Achievement(pet_id=pet_id, **ach_data).model_dump() for ach_data in DEFAULT_ACHIEVEMENTS]
+        await db.achievements.insert_many(achievements)
+
+    return orjson.dumps([clean_from_mongo(ach) for ach in achievements])
+
+@api_router.get("/achievements/{pet_id}", response_model=List[Achievement])
+async def get_achievements(pet_id: str):
+    content = await get_or_set_swr(f"achievements:{pet_id}", lambda: load_achievements(pet_id))
+    return Response(content=content, media_type="application/json")
 
 # Include the router in the main app
 app.include_router(api_router)
 
+# HTTP caching: Cache-Control per route template, ETags computed from the response body
+ROUTE_CACHE_CONTROL = {
+    "/api/shop": "public, max-age=60, stale-while-revalidate=300",
+    "/api/achievements/{pet_id}": "public, max-age=60, stale-while-revalidate=300",
+    "/api/pets/{pet_id}": "no-cache",
+}
+
+def etag_matches(if_none_match: str, etag: str) -> bool:
+    if if_none_match.strip() == "*":
+        return True
+    return etag in [tag.strip().removeprefix("W/") for tag in if_none_match.split(",")]
+
+class CacheHeadersMiddleware:
+    """Pure ASGI middleware so routes outside ROUTE_CACHE_CONTROL pass straight through."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["method"] != "GET":
+            await self.app(scope, receive, send)
+            return
+
+        start = None
+        body = []
+
+        async def send_with_cache_headers(message):
+            nonlocal start
+            if message["type"] == "http.response.start":
+                # The router has resolved scope["route"] by the time the response starts
+                cache_control = ROUTE_CACHE_CONTROL.get(getattr(scope.get("route"), "path", None))
+                if message["status"] == 200 and cache_control is not None:
+                    start = message
+                    MutableHeaders(scope=start)["Cache-Control"] = cache_control
+                    return
+            elif start is not None:
+                body.append(message.get("body", b""))
+                if message.get("more_body", False):
+                    return
+
+                content = b"".join(body)
+                headers = MutableHeaders(scope=start)
+                headers["ETag"] = f'"{hashlib.blake2b(content, digest_size=16).hexdigest()}"'
+                if etag_matches(Headers(scope=scope).get("if-none-match", ""), headers["ETag"]):
+                    del headers["content-length"]
+                    del headers["content-type"]
+                    start["status"] = 304
+                    content = b""
+                await send(start)
+                await send({"type": "http.response.body", "body": content})
+                return
+            await send(message)
+
+        await self.app(scope, receive, send_with_cache_headers)
+
+app.add_middleware(CacheHeadersMiddleware)
+
 app.add_middleware(
     CORSMiddleware,
     allow_credentials=True,
@@ -308,6 +451,94 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
+@app.on_event("startup")
+async def warm_db_pool():
+    await client.admin.command('ping')
+
+async def dedupe_shop_items():
+    # Seeding used to race inside GET /shop, so older databases can hold duplicate
+    # item sets; keep the first document per name so the unique index can build
+    duplicates = await db.shop_items.aggregate([
+        {"$sort": {"_id": 1}},
+        {"$group": {"_id": "$name", "ids": {"$push": "$_id"}, "count": {"$sum": 1}}},
+        {"$match": {"count": {"$gt": 1}}},
+    ]).to_list(None)
+    extra_ids = [item_id for group in duplicates for item_id in group["ids"][1:]]
+    if extra_ids:
+        result = await db.shop_items.delete_many({"_id": {"$in": extra_ids}})
+        logger.warning("Removed %d duplicate shop items", result.deleted_count)
+
+@app.on_event("startup")
+async def create_indexes():
+    await db.pets.create_index("id", unique=True)
+    await db.mood_entries.create_index([("pet_id", 1), ("timestamp", -1)])
+    await db.achievements.create_index("pet_id")
+    await db.shop_items.create_index("id", unique=True)
+    await dedupe_shop_items()
+    await db.shop_items.create_index("name", unique=True)
+
+MIGRATION_LEASE = timedelta(minutes=10)
+
+async def claim_migration(name: str) -> bool:
+    # A marker document makes a migration a one-off across restarts and workers. A claim
+    # that never completed (worker killed mid-run) can be retaken once its lease expires.
+    now = datetime.now(timezone.utc)
+    try:
+        await db.migrations.insert_one({"_id": name, "started_at": now})
+        return True
+    except DuplicateKeyError:
+        result = await db.migrations.update_one(
+            {"_id": name, "completed_at": {"$exists": False}, "started_at": {"$lt": now - MIGRATION_LEASE}},
+            {"$set": {"started_at": now}}
+        )
+        return result.modified_count == 1
+
+@app.on_event("startup")
+async def migrate_legacy_timestamps():
+    # Older documents stored timestamps as ISO strings; convert them once in Mongo
+    if not await claim_migration("legacy_timestamps"):
+        return
+
+    legacy_fields = [
+        (db.pets, ["created_at", "last_fed", "last_played", "last_trained"]),
+        (db.mood_entries, ["timestamp"]),
+        (db.achievements, ["unlocked_at"]),
+    ]
+    unconverted = {}
+    try:
+        for collection, fields in legacy_fields:
+            for field in fields:
+                await collection.update_many(
+                    {field: {"$type": "string"}},
+                    [{"$set": {field: {"$convert": {"input": f"${field}", "to": "date", "onError": f"${field}"}}}}]
+                )
+                remaining = await collection.count_documents({field: {"$type": "string"}})
+                if remaining:
+                    unconverted[f"{collection.name}.{field}"] = remaining
+                    logger.warning("%d %s.%s values could not be converted to dates", remaining, collection.name, field)
+    except Exception:
+        await db.migrations.delete_one({"_id": "legacy_timestamps"})
+        raise
+
+    await db.migrations.update_one(
+        {"_id": "legacy_timestamps"},
+        {"$set": {"completed_at": datetime.now(timezone.utc), "unconverted": unconverted}}
+    )
+
+@app.on_event("startup")
+async def seed_shop_items():
+    # Upsert by unique name so workers starting together cannot seed duplicate sets
+    for item_data in DEFAULT_SHOP_ITEMS:
+        try:
+            await db.shop_items.update_one(
+                {"name": item_data["name"]},
+                {"$setOnInsert": ShopItem(**item_data).model_dump()},
+                upsert=True
+            )
+        except DuplicateKeyError:
+            pass
+
 @app.on_event("shutdown")
 async def shutdown_db_client():
-    client.close()
\ No newline at end of file
+    client.close()
+    await redis_client.aclose()
\ No newline at end of file
@@ -0,0 +1,29 @@
+import os
+import sys
+from pathlib import Path
+
+import fakeredis
+import pytest
+from mongomock_motor import AsyncMongoMockClient
+
+os.environ.setdefault("MONGO_URL", "mongodb://localhost:27017")
+os.environ.setdefault("DB_NAME", "moodpet_test")
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "backend"))
+
+import server  # noqa: E402
+
+
+@pytest.fixture
+def fake_redis(monkeypatch):
+    fake = fakeredis.FakeAsyncRedis()
+    monkeypatch.setattr(server, "redis_client", fake)
+    monkeypatch.setattr(server, "_inflight", {})
+    monkeypatch.setattr(server, "_refreshing", {})
+    return fake
+
+
+@pytest.fixture
+def mock_db(monkeypatch):
+    database = AsyncMongoMockClient()["moodpet_test"]
+    monkeypatch.setattr(server, "db", database)
+    return database
@@ -0,0 +1,51 @@
+import pytest
+from fastapi.testclient import TestClient
+
+import server
+
+SHOP_BODY = b'[{"id":"1","name":"Toy Ball","description":"Fun toy for playing","price":30,"category":"toy","icon":"ball"}]'
+
+
+@pytest.fixture
+def client(fake_redis, monkeypatch):
+    async def load_shop_items():
+        return SHOP_BODY
+
+    monkeypatch.setattr(server, "load_shop_items", load_shop_items)
+    return TestClient(server.app)
+
+
+def test_cached_route_sets_etag_and_cache_control(client):
+    response = client.get("/api/shop")
+
+    assert response.status_code == 200
+    assert response.content == SHOP_BODY
+    assert response.headers["etag"].startswith('"')
+    assert response.headers["cache-control"] == server.ROUTE_CACHE_CONTROL["/api/shop"]
+
+
+@pytest.mark.parametrize("if_none_match", ["{etag}", "W/{etag}", '"other", {etag}', "*"])
+def test_matching_if_none_match_returns_304(client, if_none_match):
+    etag = client.get("/api/shop").headers["etag"]
+
+    response = client.get("/api/shop", headers={"If-None-Match": if_none_match.format(etag=etag)})
+
+    assert response.status_code == 304
+    assert response.content == b""
+    assert response.headers["etag"] == etag
+    assert "content-length" not in response.headers
+
+
+def test_mismatched_if_none_match_returns_body(client):
+    response = client.get("/api/shop", headers={"If-None-Match": '"stale"'})
+
+    assert response.status_code == 200
+    assert response.content == SHOP_BODY
+
+
+def test_unconfigured_route_passes_through(client):
+    response = client.get("/openapi.json")
+
+    assert response.status_code == 200
+    assert "etag" not in response.headers
+    assert "cache-control" not in response.headers
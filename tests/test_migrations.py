@@ -0,0 +1,34 @@
+import asyncio
+from datetime import datetime, timezone
+
+import server
+
+
+def test_first_claim_wins(mock_db):
+    async def run():
+        return await server.claim_migration("example"), await server.claim_migration("example")
+
+    assert asyncio.run(run()) == (True, False)
+
+
+def test_completed_migration_is_not_reclaimed(mock_db):
+    async def run():
+        await mock_db.migrations.insert_one({
+            "_id": "example",
+            "started_at": datetime.now(timezone.utc) - 2 * server.MIGRATION_LEASE,
+            "completed_at": datetime.now(timezone.utc),
+        })
+        return await server.claim_migration("example")
+
+    assert asyncio.run(run()) is False
+
+
+def test_stale_unfinished_claim_is_reclaimed_once(mock_db):
+    async def run():
+        await mock_db.migrations.insert_one({
+            "_id": "example",
+            "started_at": datetime.now(timezone.utc) - 2 * server.MIGRATION_LEASE,
+        })
+        return await server.claim_migration("example"), await server.claim_migration("example")
+
+    assert asyncio.run(run()) == (True, False)
@@ -0,0 +1,31 @@
+import asyncio
+
+import server
+
+
+def test_duplicate_shop_sets_are_removed_before_unique_index(mock_db):
+    async def run():
+        for _ in range(2):
+            await mock_db.shop_items.insert_many(
+                [server.ShopItem(**item_data).model_dump() for item_data in server.DEFAULT_SHOP_ITEMS]
+            )
+        first_ids = [item["id"] for item in await mock_db.shop_items.find().sort("_id", 1).limit(5).to_list(None)]
+
+        await server.create_indexes()
+        await server.seed_shop_items()
+        return first_ids, await mock_db.shop_items.find().sort("_id", 1).to_list(None)
+
+    first_ids, items = asyncio.run(run())
+
+    assert [item["id"] for item in items] == first_ids
+    assert sorted(item["name"] for item in items) == sorted(item["name"] for item in server.DEFAULT_SHOP_ITEMS)
+
+
+def test_seeding_twice_inserts_one_set(mock_db):
+    async def run():
+        await server.create_indexes()
+        await server.seed_shop_items()
+        await server.seed_shop_items()
+        return await mock_db.shop_items.count_documents({})
+
+    assert asyncio.run(run()) == len(server.DEFAULT_SHOP_ITEMS)
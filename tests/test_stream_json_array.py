@@ -0,0 +1,46 @@
+import asyncio
+
+import orjson
+import pytest
+
+import server
+
+
+class FakeCursor:
+    def __init__(self, docs):
+        self.docs = docs
+        self.position = 0
+
+    async def to_list(self, length):
+        batch = self.docs[self.position:self.position + length]
+        self.position += len(batch)
+        return batch
+
+
+def collect(docs):
+    async def run():
+        return b"".join([chunk async for chunk in server.stream_json_array(FakeCursor(docs))])
+
+    return asyncio.run(run())
+
+
+@pytest.mark.parametrize("count", [0, 1, 200, 201, 500, 501, 1234])
+def test_stream_round_trips(count):
+    docs = [{"id": str(i), "name": f"pet {i}", "happiness": i % 101} for i in range(count)]
+
+    assert orjson.loads(collect(docs)) == docs
+
+
+def test_only_large_batches_are_offloaded(monkeypatch):
+    offloaded = []
+    run_sync = server.anyio.to_thread.run_sync
+
+    async def counting_run_sync(func, *args):
+        offloaded.append(len(args[0]))
+        return await run_sync(func, *args)
+
+    monkeypatch.setattr(server.anyio.to_thread, "run_sync", counting_run_sync)
+    docs = [{"id": str(i)} for i in range(server.STREAM_BATCH_SIZE + server.OFFLOAD_ENCODE_THRESHOLD)]
+
+    assert orjson.loads(collect(docs)) == docs
+    assert offloaded == [server.STREAM_BATCH_SIZE]
@@ -0,0 +1,83 @@
+import asyncio
+import time
+
+from redis.exceptions import RedisError
+
+import server
+
+
+def test_concurrent_misses_share_one_fill(fake_redis):
+    calls = 0
+
+    async def factory():
+        nonlocal calls
+        calls += 1
+        await asyncio.sleep(0.01)
+        return b"payload"
+
+    async def run():
+        return await asyncio.gather(*[server.get_or_set_swr("key", factory) for _ in range(50)])
+
+    results = asyncio.run(run())
+
+    assert calls == 1
+    assert results == [b"payload"] * 50
+    assert server._inflight == {}
+
+
+def test_failing_fill_propagates_and_clears_inflight(fake_redis):
+    async def factory():
+        await asyncio.sleep(0.01)
+        raise ValueError("boom")
+
+    async def run():
+        return await asyncio.gather(
+            *[server.get_or_set_swr("key", factory) for _ in range(5)], return_exceptions=True
+        )
+
+    results = asyncio.run(run())
+
+    assert all(isinstance(result, ValueError) for result in results)
+    assert server._inflight == {}
+
+
+def test_fresh_hit_skips_factory(fake_redis):
+    async def factory():
+        raise AssertionError("factory should not run on a fresh hit")
+
+    async def run():
+        await fake_redis.set("key", b"cached")
+        await fake_redis.set("key:fresh_until", time.time() + 60)
+        return await server.get_or_set_swr("key", factory)
+
+    assert asyncio.run(run()) == b"cached"
+
+
+def test_stale_hit_serves_cached_and_refreshes(fake_redis):
+    async def factory():
+        return b"fresh"
+
+    async def run():
+        await fake_redis.set("key", b"stale")
+        await fake_redis.set("key:fresh_until", time.time() - 1)
+        served = await server.get_or_set_swr("key", factory)
+        await server._refreshing["key"]
+        return served, await fake_redis.get("key")
+
+    served, stored = asyncio.run(run())
+
+    assert served == b"stale"
+    assert stored == b"fresh"
+    assert server._refreshing == {}
+
+
+def test_redis_error_falls_back_to_factory(fake_redis, monkeypatch):
+    async def broken_mget(*keys):
+        raise RedisError("down")
+
+    async def factory():
+        return b"direct"
+
+    monkeypatch.setattr(fake_redis, "mget", broken_mget)
+
+    assert asyncio.run(server.get_or_set_swr("key", factory)) == b"direct"